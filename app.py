@@ -2,20 +2,35 @@
 # Run: streamlit run app.py
 
 import base64
+import hashlib
 import math
 import os
 import time
+from contextlib import contextmanager
 from datetime import datetime
 import streamlit as st
 import streamlit.components.v1 as components
 
 from config import AppConfig
-from db import ParkingDB
+from db import ParkingDB, query_count
 from auth import is_logged_in, render_login, render_logout
-from image_io import bgr_from_bytes, bgr_to_rgb, save_pair
+from image_io import bgr_from_bytes, bgr_to_rgb, encode_preview, save_pair
+from thumbs import ThumbCache
 from engine import run_yolo_ocr, decide_in_out, now_ts
 from model_loader import load_models
 
+# show_spinner=False: cache miss không tạo element nào trước st.set_page_config
+@st.cache_resource(show_spinner=False)
+def get_db(db_path: str) -> ParkingDB:
+    # init() (CREATE TABLE / migrate) chỉ chạy 1 lần cho mỗi process, không phải mỗi rerun
+    db = ParkingDB(db_path, count_queries=CFG.debug_perf)
+    db.init()
+    return db
+
+@st.cache_resource(show_spinner=False)
+def get_thumbs(thumb_dir: str, max_side: int, max_bytes: int) -> ThumbCache:
+    return ThumbCache(thumb_dir, max_side=max_side, max_bytes=max_bytes)
+
 CFG = AppConfig()
 camera_selector = components.declare_component("camera_selector", path="camera_component")
 
@@ -42,25 +57,69 @@ def bytes_from_data_url(data_url: str) -> bytes | None:
     except (ValueError, TypeError):
         return None
 
+@st.cache_data(ttl=CFG.query_cache_ttl_s)
+def load_today_summary(db_path: str):
+    return get_db(db_path).today_summary()
+
+@st.cache_data(ttl=CFG.query_cache_ttl_s)
+def load_recent_events(db_path: str, limit: int = 20):
+    return get_db(db_path).recent_events(limit=limit)
+
+def show_saved_image(path: str, caption: str, full_res: bool) -> None:
+    # Mặc định chỉ gửi preview (RAM/đĩa), ảnh gốc chỉ khi operator bật full resolution.
+    # Ảnh gốc bị xoá: ThumbCache.get trả None khi cache miss, không stat đĩa mỗi lần render.
+    if not path:
+        return
+    if full_res:
+        if os.path.exists(path):
+            st.image(path, caption=caption, use_container_width=True)
+        return
+    thumbs = get_thumbs(CFG.thumb_dir, CFG.thumb_max_side, CFG.thumb_cache_bytes)
+    data = thumbs.get(path)
+    if data is not None:
+        st.image(data, caption=caption, use_container_width=True)
+
+def show_frame(img_bgr, preview: bytes | None, caption: str, full_res: bool) -> None:
+    # preview đã encode sẵn 1 lần lúc xử lý ảnh, dùng lại cho mọi lần hiển thị.
+    # Thiếu preview (pipeline lỗi giữa chừng) -> hiển thị ảnh gốc như trước.
+    if img_bgr is None or img_bgr.size == 0:
+        st.caption(f"{caption}: ảnh rỗng")
+        return
+    if full_res or preview is None:
+        st.image(bgr_to_rgb(img_bgr), caption=caption, use_container_width=True)
+    else:
+        st.image(preview, caption=caption, use_container_width=True)
+
+def invalidate_event_caches() -> None:
+    # Gọi sau mỗi insert_event để dashboard / nhật ký lấy số liệu mới ở lần refresh kế tiếp
+    load_today_summary.clear()
+    load_recent_events.clear()
+
+@contextmanager
+def perf_probe(label: str):
+    """
+    Đo wall time + số câu SQL của 1 lần chạy (toàn trang hoặc 1 fragment).
+    Chỉ bật khi CFG.debug_perf (LPR_DEBUG_PERF=1), hiện caption nhỏ ở cuối.
+    """
+    if not CFG.debug_perf:
+        yield
+        return
+    q0 = query_count()
+    t0 = time.perf_counter()
+    yield
+    ms = (time.perf_counter() - t0) * 1000
+    st.caption(f"⏱ {label}: {ms:.0f} ms • DB queries: {query_count() - q0}")
+
 # ----------- Page config (UI first) -----------
 st.set_page_config(page_title="Parking LPR Live", layout="wide")
 st.title("Parking LPR — Live Camera Capture (Render-first + Lazy-load)")
 
-# ----------- DB init (cheap, safe) -----------
-db = ParkingDB(CFG.db_path)
-db.init()
-
-# ----------- Sidebar: Auth + Model + Rates (UI first) -----------
-with st.sidebar:
-    st.header("Tài khoản")
-    if not is_logged_in():
-        render_login(CFG.users)
-    else:
-        st.write(f"User: **{st.session_state.get('username','')}**")
-        render_logout()
-    is_admin = st.session_state.get("username") in CFG.admin_users
+page_start = time.perf_counter()
+page_q0 = query_count()
 
-    st.divider()
+# ----------- Sidebar fragments: Model + Rates -----------
+@st.fragment
+def sidebar_model() -> None:
     st.header("Model (Lazy load)")
 
     loaded = st.session_state.get("model_loaded", False)
@@ -94,7 +153,13 @@ with st.sidebar:
             st.success("Unloaded.")
             st.rerun()
 
-    st.divider()
+@st.fragment
+def sidebar_rates(is_admin: bool) -> None:
+    # Đổi giá chỉ rerun fragment này, không chạy lại dashboard / nhận diện
+    with perf_probe("Cấu hình giá"):
+        _sidebar_rates_body(is_admin)
+
+def _sidebar_rates_body(is_admin: bool) -> None:
     st.header("Cấu hình giá")
     if not is_admin:
         st.info("Chỉ admin mới được chỉnh giá.")
@@ -169,184 +234,317 @@ with st.sidebar:
     )
     st.session_state["rates"] = rates
 
-# ----------- Dashboard today -----------
-total_fee, counts = db.today_summary()
-d1, d2, d3 = st.columns(3)
-d1.metric("Doanh thu hôm nay (OUT)", f"{total_fee:,} VND")
-d2.metric("Lượt OUT xe máy", counts.get("motorbike", 0))
-d3.metric("Lượt OUT ô tô", counts.get("car", 0))
+# ----------- Sidebar: Auth (full rerun) + fragments -----------
+with st.sidebar:
+    st.header("Tài khoản")
+    if not is_logged_in():
+        render_login(CFG.users)
+    else:
+        st.write(f"User: **{st.session_state.get('username','')}**")
+        render_logout()
+    is_admin = st.session_state.get("username") in CFG.admin_users
+
+    st.divider()
+    sidebar_model()
+
+    st.divider()
+    sidebar_rates(is_admin)
+
+# ----------- Dashboard today (timed refresh) -----------
+@st.fragment(run_every=CFG.dashboard_refresh_s)
+def dashboard() -> None:
+    with perf_probe("Dashboard"):
+        total_fee, counts = load_today_summary(CFG.db_path)
+        d1, d2, d3 = st.columns(3)
+        d1.metric("Doanh thu hôm nay (OUT)", f"{total_fee:,} VND")
+        d2.metric("Lượt OUT xe máy", counts.get("motorbike", 0))
+        d3.metric("Lượt OUT ô tô", counts.get("car", 0))
+
+dashboard()
 
 st.divider()
 
-# ----------- Main UI (render first) -----------
-header_col, model_col = st.columns([3, 1])
-with header_col:
-    st.subheader("Live Camera")
-with model_col:
-    st.caption("Model: YOLO • PaddleOCR")
-
-camera_source = st.selectbox(
-    "Nguồn camera",
-    ["Mặc định (trình duyệt)", "Chọn camera ngoài (USB/HDMI)"],
-    key="camera_source",
-)
-
-# (UI-first) init default vehicle type for fee calculation
-if "vehicle_type" not in st.session_state:
-    st.session_state["vehicle_type"] = "car"
-
-vehicle_type = st.radio(
-    "Loại xe (dùng để tính tiền khi OUT)",
-    ["motorbike", "car"],
-    index=0 if st.session_state["vehicle_type"] == "motorbike" else 1,
-    format_func=lambda x: "Xe máy" if x == "motorbike" else "Ô tô",
-    key="vehicle_type_widget",
-)
-
-# sync widget -> canonical state (avoid Streamlit key conflicts)
-st.session_state["vehicle_type"] = st.session_state["vehicle_type_widget"]
-
-shot_bytes = None
-if camera_source == "Mặc định (trình duyệt)":
-    shot = st.camera_input("Bấm chụp để nhận diện", key="camera_shot")
-    if shot is not None:
-        shot_bytes = shot.getvalue()
-else:
-    st.caption("Chọn camera ngoài từ danh sách bên dưới, bật camera rồi bấm chụp.")
-    external_capture = camera_selector(label="Camera ngoài", key="external_camera")
-    if isinstance(external_capture, dict):
-        data_url = external_capture.get("data_url")
-        shot_bytes = bytes_from_data_url(data_url)
-        device_label = external_capture.get("device_label")
-        if shot_bytes and device_label:
-            st.success(f"Đã nhận ảnh từ: {device_label}")
-
-st.caption(
-    "Luồng: Chụp → YOLO detect → OCR → chuẩn hoá → tra DB mở phiên → tự IN/OUT "
-    "→ tính tiền theo thời lượng khi OUT → lưu & hiển thị so sánh khi OUT"
-)
-
-# If no shot, stop here
-if shot_bytes is None:
-    st.info("Mở camera và bấm chụp để hệ thống nhận diện.")
-    st.stop()
-
-# Validate model loaded
-if not st.session_state.get("model_loaded", False):
-    st.warning("Bạn chưa load model. Hãy bấm 'Load models' ở sidebar trước.")
-    st.stop()
-
-yolo = st.session_state.get("yolo")
-ocr = st.session_state.get("ocr")
-if yolo is None or ocr is None:
-    st.warning("Model chưa sẵn sàng. Hãy Load lại.")
-    st.stop()
-
-# Decode image from camera
-img_bgr = bgr_from_bytes(shot_bytes)
-if img_bgr is None:
-    st.error("Không decode được ảnh từ camera.")
-    st.stop()
-
-# Inference with try/except
-try:
-    start_time = time.perf_counter()
-    with st.spinner("Đang dự đoán YOLO + OCR..."):
-        out = run_yolo_ocr(yolo, ocr, img_bgr)
-    processing_ms = (time.perf_counter() - start_time) * 1000
-
-    if out is None:
-        st.warning("Không phát hiện biển số.")
-        st.image(bgr_to_rgb(img_bgr), caption="Ảnh chụp", use_container_width=True)
-        st.stop()
-
-    # Use current vehicle_type (manual)
-    vehicle_type = st.session_state.get("vehicle_type", "car")
-
-    plate_canon = out["plate_canon"]
-    plate_display = out["plate_display"]
-
-    c1, c2 = st.columns(2)
-    with c1:
-        st.image(bgr_to_rgb(out["annotated"]), caption="Ảnh + bbox", use_container_width=True)
-    with c2:
-        st.image(bgr_to_rgb(out["crop"]), caption="Crop biển số", use_container_width=True)
-        st.write("Raw:", out["raw_text"])
-        st.write("Plate:", plate_display)
-        st.write("Canon:", plate_canon)
-
-    if not plate_canon:
-        st.warning("OCR chưa ra biển số hợp lệ. Bạn chụp lại giúp.")
-        st.stop()
-
-    # Decide IN/OUT by DB (open session)
-    action = decide_in_out(db, plate_canon)
-    last_in = db.latest_in(plate_canon) if action == "OUT" else None
-    last_in_today = db.latest_in_today(plate_canon) if action == "OUT" else None
-
-    rates = st.session_state.get("rates", {})
-    grace_minutes = int(rates.get("grace_minutes", 0))
-
-    ts = now_ts()
-
-    duration_minutes = 0
-    fee = 0
-    vehicle_type_fee = vehicle_type
-    if action == "OUT":
-        if last_in is None:
-            st.warning("Không tìm thấy lượt IN trước đó để tính phí.")
-        else:
-            in_time = parse_ts(last_in["ts"])
-            out_time = parse_ts(ts)
-            duration_minutes = max(0, int((out_time - in_time).total_seconds() // 60))
-            fee = compute_fee(duration_minutes, rates.get(vehicle_type_fee, {}), grace_minutes)
-            last_in_type = last_in.get("vehicle_type")
-            if last_in_type and last_in_type != vehicle_type_fee:
-                in_label = "Xe máy" if last_in_type == "motorbike" else "Ô tô"
-                out_label = "Xe máy" if vehicle_type_fee == "motorbike" else "Ô tô"
-                st.warning(
-                    "Loại xe lúc IN khác lựa chọn hiện tại. "
-                    f"IN: {in_label} → OUT: {out_label}. "
-                    "Hệ thống đang tính phí theo lựa chọn hiện tại."
-                )
-
-    full_path, crop_path = save_pair(CFG.run_dir, out["annotated"], out["crop"])
-
-    # IMPORTANT: insert_event signature MUST match db.py (vehicle_type + fee)
-    db.insert_event(ts, action, vehicle_type_fee, plate_canon, plate_display, fee, full_path, crop_path)
-
-    vt_label = "Xe máy" if vehicle_type_fee == "motorbike" else "Ô tô"
-    duration_text = f"{duration_minutes} phút" if action == "OUT" else "N/A"
+# ----------- Capture + Recognize (chỉ fragment này rerun khi chụp) -----------
+@st.fragment
+def recognition() -> None:
+    with perf_probe("Nhận diện"):
+        _recognition_body()
+
+def _recognition_body() -> None:
+    db = get_db(CFG.db_path)
+
+    header_col, model_col = st.columns([3, 1])
+    with header_col:
+        st.subheader("Live Camera")
+    with model_col:
+        st.caption("Model: YOLO • PaddleOCR")
+
+    camera_source = st.selectbox(
+        "Nguồn camera",
+        ["Mặc định (trình duyệt)", "Chọn camera ngoài (USB/HDMI)"],
+        key="camera_source",
+    )
+
+    # (UI-first) init default vehicle type for fee calculation
+    if "vehicle_type" not in st.session_state:
+        st.session_state["vehicle_type"] = "car"
+
+    vehicle_type = st.radio(
+        "Loại xe (dùng để tính tiền khi OUT)",
+        ["motorbike", "car"],
+        index=0 if st.session_state["vehicle_type"] == "motorbike" else 1,
+        format_func=lambda x: "Xe máy" if x == "motorbike" else "Ô tô",
+        key="vehicle_type_widget",
+    )
+
+    # sync widget -> canonical state (avoid Streamlit key conflicts)
+    st.session_state["vehicle_type"] = st.session_state["vehicle_type_widget"]
+
+    shot_bytes = None
+    if camera_source == "Mặc định (trình duyệt)":
+        shot = st.camera_input("Bấm chụp để nhận diện", key="camera_shot")
+        if shot is not None:
+            shot_bytes = shot.getvalue()
+    else:
+        st.caption("Chọn camera ngoài từ danh sách bên dưới, bật camera rồi bấm chụp.")
+        external_capture = camera_selector(label="Camera ngoài", key="external_camera")
+        if isinstance(external_capture, dict):
+            data_url = external_capture.get("data_url")
+            shot_bytes = bytes_from_data_url(data_url)
+            device_label = external_capture.get("device_label")
+            if shot_bytes and device_label:
+                st.success(f"Đã nhận ảnh từ: {device_label}")
+
+    full_res = st.toggle("Ảnh gốc (full resolution)", value=False, key="full_res_compare")
+
+    st.caption(
+        "Luồng: Chụp → YOLO detect → OCR → chuẩn hoá → tra DB mở phiên → tự IN/OUT "
+        "→ tính tiền theo thời lượng khi OUT → lưu & hiển thị so sánh khi OUT"
+    )
+
+    # If no shot, stop here (return thay cho st.stop: chỉ dừng fragment)
+    if shot_bytes is None:
+        st.info("Mở camera và bấm chụp để hệ thống nhận diện.")
+        return
+
+    # Camera giữ ảnh chụp cuối: rerun fragment (vd. bật full resolution) với cùng ảnh
+    # chỉ hiển thị lại kết quả đã lưu, KHÔNG chạy lại YOLO/OCR và KHÔNG insert_event lần 2
+    shot_key = hashlib.sha1(shot_bytes).hexdigest()
+    result = st.session_state.get("recognition_result")
+    if result is None or result["shot_key"] != shot_key:
+        # Validate model loaded
+        if not st.session_state.get("model_loaded", False):
+            st.warning("Bạn chưa load model. Hãy bấm 'Load models' ở sidebar trước.")
+            return
+
+        yolo = st.session_state.get("yolo")
+        ocr = st.session_state.get("ocr")
+        if yolo is None or ocr is None:
+            st.warning("Model chưa sẵn sàng. Hãy Load lại.")
+            return
+
+        # Decode image from camera
+        img_bgr = bgr_from_bytes(shot_bytes)
+        if img_bgr is None:
+            st.error("Không decode được ảnh từ camera.")
+            return
+
+        result = process_shot(db, yolo, ocr, img_bgr)
+        result["shot_key"] = shot_key
+        st.session_state["recognition_result"] = result
+
+        # Có event mới: rerun cả trang 1 lần để dashboard + nhật ký hiện ngay (không chờ run_every).
+        # Lần rerun đó gặp lại shot_key nên chỉ render kết quả đã lưu, không chạy lại YOLO/OCR.
+        if result["event"] is not None:
+            st.rerun()
+
+    render_result(result, full_res)
+
+def process_shot(db: ParkingDB, yolo, ocr, img_bgr) -> dict:
+    """
+    YOLO + OCR → IN/OUT → tính phí → save_pair + insert_event (chạy đúng 1 lần cho mỗi ảnh chụp).
+    Trả về dict để render_result hiển thị (và hiển thị lại khi fragment rerun).
+    """
+    result = {"out": None, "img_bgr": img_bgr, "previews": {}, "warnings": [], "event": None, "error": None}
+    # Inference with try/except
+    try:
+        start_time = time.perf_counter()
+        with st.spinner("Đang dự đoán YOLO + OCR..."):
+            out = run_yolo_ocr(yolo, ocr, img_bgr)
+        processing_ms = (time.perf_counter() - start_time) * 1000
+
+        if out is None:
+            result["warnings"].append("Không phát hiện biển số.")
+            result["previews"]["frame"] = encode_preview(img_bgr, CFG.thumb_max_side)
+            return result
+        result["out"] = out
+
+        # Use current vehicle_type (manual)
+        vehicle_type = st.session_state.get("vehicle_type", "car")
+
+        plate_canon = out["plate_canon"]
+        plate_display = out["plate_display"]
+
+        if not plate_canon:
+            result["warnings"].append("OCR chưa ra biển số hợp lệ. Bạn chụp lại giúp.")
+            result["previews"]["annotated"] = encode_preview(out["annotated"], CFG.thumb_max_side)
+            if out["crop"].size:  # box YOLO suy biến -> crop rỗng
+                result["previews"]["crop"] = encode_preview(out["crop"], CFG.thumb_max_side)
+            return result
+
+        # Decide IN/OUT by DB (open session)
+        action = decide_in_out(db, plate_canon)
+        last_in = db.latest_in(plate_canon) if action == "OUT" else None
+        last_in_today = db.latest_in_today(plate_canon) if action == "OUT" else None
+
+        rates = st.session_state.get("rates", {})
+        grace_minutes = int(rates.get("grace_minutes", 0))
+
+        ts = now_ts()
+
+        duration_minutes = 0
+        fee = 0
+        vehicle_type_fee = vehicle_type
+        if action == "OUT":
+            if last_in is None:
+                result["warnings"].append("Không tìm thấy lượt IN trước đó để tính phí.")
+            else:
+                in_time = parse_ts(last_in["ts"])
+                out_time = parse_ts(ts)
+                duration_minutes = max(0, int((out_time - in_time).total_seconds() // 60))
+                fee = compute_fee(duration_minutes, rates.get(vehicle_type_fee, {}), grace_minutes)
+                last_in_type = last_in.get("vehicle_type")
+                if last_in_type and last_in_type != vehicle_type_fee:
+                    in_label = "Xe máy" if last_in_type == "motorbike" else "Ô tô"
+                    out_label = "Xe máy" if vehicle_type_fee == "motorbike" else "Ô tô"
+                    result["warnings"].append(
+                        "Loại xe lúc IN khác lựa chọn hiện tại. "
+                        f"IN: {in_label} → OUT: {out_label}. "
+                        "Hệ thống đang tính phí theo lựa chọn hiện tại."
+                    )
+
+        full_path, crop_path, previews = save_pair(
+            CFG.run_dir, out["annotated"], out["crop"],
+            thumb_dir=CFG.thumb_dir, thumb_max_side=CFG.thumb_max_side,
+        )
+        # Preview vừa encode lúc lưu: đưa vào LRU + dùng lại để hiển thị, không encode lần nữa
+        thumbs = get_thumbs(CFG.thumb_dir, CFG.thumb_max_side, CFG.thumb_cache_bytes)
+        for path, data in previews.items():
+            thumbs.put(path, data)
+        result["previews"]["annotated"] = previews[full_path]
+        result["previews"]["crop"] = previews[crop_path]
+
+        # IMPORTANT: insert_event signature MUST match db.py (vehicle_type + fee)
+        db.insert_event(ts, action, vehicle_type_fee, plate_canon, plate_display, fee, full_path, crop_path)
+        invalidate_event_caches()
+
+        result["event"] = {
+            "action": action,
+            "plate_display": plate_display,
+            "vt_label": "Xe máy" if vehicle_type_fee == "motorbike" else "Ô tô",
+            "fee": fee,
+            "duration_text": f"{duration_minutes} phút" if action == "OUT" else "N/A",
+            "ts": ts,
+            "processing_ms": processing_ms,
+            "last_in_today": last_in_today,
+        }
+
+    except Exception as e:
+        result["error"] = e
+    return result
+
+def render_result(result: dict, full_res: bool) -> None:
+    out = result["out"]
+    previews = result["previews"]
+
+    if out is None and result["error"] is None:
+        for msg in result["warnings"]:
+            st.warning(msg)
+        show_frame(result["img_bgr"], previews.get("frame"), "Ảnh chụp", full_res)
+        return
+
+    if out is not None:
+        c1, c2 = st.columns(2)
+        with c1:
+            show_frame(out["annotated"], previews.get("annotated"), "Ảnh + bbox", full_res)
+        with c2:
+            show_frame(out["crop"], previews.get("crop"), "Crop biển số", full_res)
+            st.write("Raw:", out["raw_text"])
+            st.write("Plate:", out["plate_display"])
+            st.write("Canon:", out["plate_canon"])
+
+    for msg in result["warnings"]:
+        st.warning(msg)
+
+    if result["error"] is not None:
+        st.error("Có lỗi khi chạy pipeline.")
+        st.exception(result["error"])
+        return
+
+    event = result["event"]
+    if event is None:
+        return
+
     st.success(
-        f"Hệ thống xác định: **{action}** | **{plate_display}** | "
-        f"loại={vt_label} | fee={fee:,} VND | thời lượng={duration_text} | time={ts}"
+        f"Hệ thống xác định: **{event['action']}** | **{event['plate_display']}** | "
+        f"loại={event['vt_label']} | fee={event['fee']:,} VND | "
+        f"thời lượng={event['duration_text']} | time={event['ts']}"
     )
-    st.caption(f"Thời gian xử lý: {processing_ms:.0f} ms")
+    st.caption(f"Thời gian xử lý: {event['processing_ms']:.0f} ms")
 
     # Compare IN vs OUT
-    if action == "OUT" and last_in_today is not None:
+    last_in_today = event["last_in_today"]
+    if event["action"] == "OUT" and last_in_today is not None:
         st.subheader("So sánh IN vs OUT (trong ngày)")
         colA, colB = st.columns(2)
 
         with colA:
             st.markdown("### Ảnh lúc IN (gần nhất hôm nay)")
-            if last_in_today.get("img_path") and os.path.exists(last_in_today["img_path"]):
-                st.image(last_in_today["img_path"], caption=f"IN @ {last_in_today['ts']}", use_container_width=True)
-            if last_in_today.get("crop_path") and os.path.exists(last_in_today["crop_path"]):
-                st.image(last_in_today["crop_path"], caption="Crop IN", use_container_width=True)
+            show_saved_image(last_in_today.get("img_path"), f"IN @ {last_in_today['ts']}", full_res)
+            show_saved_image(last_in_today.get("crop_path"), "Crop IN", full_res)
 
         with colB:
             st.markdown("### Ảnh hiện tại (OUT)")
-            st.image(bgr_to_rgb(out["annotated"]), caption=f"OUT @ {ts}", use_container_width=True)
-            st.image(bgr_to_rgb(out["crop"]), caption="Crop OUT", use_container_width=True)
+            show_frame(out["annotated"], previews.get("annotated"), f"OUT @ {event['ts']}", full_res)
+            show_frame(out["crop"], previews.get("crop"), "Crop OUT", full_res)
 
-except Exception as e:
-    st.error("Có lỗi khi chạy pipeline.")
-    st.exception(e)
+recognition()
 
 st.divider()
-st.subheader("Nhật ký gần đây")
-rows = db.recent_events(limit=20)
-for ts, action, vtype, plate_disp, plate_canon, fee, img_path, crop_path in rows:
-    vt = "Xe máy" if vtype == "motorbike" else "Ô tô"
-    st.write(f"{ts} | {action} | {vt} | {plate_disp} | fee={int(fee):,} VND | canon={plate_canon}")
+
+# ----------- History log (timed refresh) -----------
+@st.fragment(run_every=CFG.history_refresh_s)
+def history_log() -> None:
+    st.subheader("Nhật ký gần đây")
+    with perf_probe("Nhật ký"):
+        rows = load_recent_events(CFG.db_path, limit=20)
+        for ts, action, vtype, plate_disp, plate_canon, fee, img_path, crop_path in rows:
+            vt = "Xe máy" if vtype == "motorbike" else "Ô tô"
+            st.write(f"{ts} | {action} | {vt} | {plate_disp} | fee={int(fee):,} VND | canon={plate_canon}")
+
+history_log()
+
+# ----------- Image gallery (không run_every: cập nhật khi có capture mới hoặc khi bấm toggle) -----------
+@st.fragment
+def history_gallery() -> None:
+    if not st.toggle("Hiện gallery ảnh", value=False, key="show_gallery"):
+        return
+    st.caption("Gallery tự cập nhật sau mỗi lần chụp; không tự làm mới theo chu kỳ như nhật ký.")
+    with perf_probe("Gallery"):
+        gallery_full_res = st.toggle("Ảnh gốc (full resolution)", value=False, key="full_res_gallery")
+        rows = load_recent_events(CFG.db_path, limit=20)
+        per_row = 4
+        for i in range(0, len(rows), per_row):
+            cols = st.columns(per_row)
+            for col, row in zip(cols, rows[i:i + per_row]):
+                ts, action, _, plate_disp, _, _, img_path, crop_path = row
+                with col:
+                    show_saved_image(img_path, f"{action} | {plate_disp} @ {ts}", gallery_full_res)
+                    show_saved_image(crop_path, "Crop", gallery_full_res)
+
+history_gallery()
+
+# Full rerun (lần đầu mở trang / login / load model) — để so sánh với rerun từng fragment
+if CFG.debug_perf:
+    page_ms = (time.perf_counter() - page_start) * 1000
+    st.caption(f"⏱ Toàn trang (full rerun): {page_ms:.0f} ms • DB queries: {query_count() - page_q0}")
@@ -1,3 +1,4 @@
+import os
 from dataclasses import dataclass
 from pathlib import Path
 
@@ -8,6 +9,13 @@ class AppConfig:
     run_dir: str = "runs"
     users: dict = None
     admin_users: tuple = ("admin",)
+    dashboard_refresh_s: int = 15   # chu kỳ tự làm mới fragment dashboard
+    history_refresh_s: int = 30     # chu kỳ tự làm mới fragment nhật ký
+    query_cache_ttl_s: int = 60     # TTL cache kết quả truy vấn DB (st.cache_data)
+    debug_perf: bool = os.environ.get("LPR_DEBUG_PERF") == "1"  # hiện wall time + số query mỗi lần chạy
+    thumb_dir: str = "runs/thumbs"
+    thumb_max_side: int = 320       # cạnh dài tối đa của preview (px)
+    thumb_cache_bytes: int = 16 * 1024 * 1024  # giới hạn LRU preview trong RAM
 
     def __post_init__(self):
         if self.users is None:
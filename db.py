@@ -1,13 +1,33 @@
 import sqlite3
+import threading
 from datetime import date
 from typing import Optional, Dict, Any, List, Tuple
 
+# Bộ đếm câu SQL theo thread: mỗi session Streamlit chạy script/fragment trên thread riêng,
+# nên hiệu số trước/sau 1 lần chạy chỉ tính query của chính lần chạy đó.
+_local = threading.local()
+
+def query_count() -> int:
+    return getattr(_local, "queries", 0)
+
+def _count_query(sql: str) -> None:
+    # Bỏ qua BEGIN/COMMIT ngầm của sqlite3, chỉ đếm câu lệnh thật
+    if not sql.lstrip().upper().startswith(("BEGIN", "COMMIT", "ROLLBACK")):
+        _local.queries = query_count() + 1
+
 class ParkingDB:
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, count_queries: bool = False):
         self.db_path = db_path
+        self.count_queries = count_queries  # chỉ bật khi debug perf: trace callback chạy trên mọi câu SQL
 
-    def init(self) -> None:
+    def _connect(self) -> sqlite3.Connection:
         conn = sqlite3.connect(self.db_path)
+        if self.count_queries:
+            conn.set_trace_callback(_count_query)
+        return conn
+
+    def init(self) -> None:
+        conn = self._connect()
         cur = conn.cursor()
         cur.execute("""
         CREATE TABLE IF NOT EXISTS events (
@@ -39,7 +59,7 @@ class ParkingDB:
                      plate_canon: str, plate_display: str, fee: int,
                      img_path: str, crop_path: str) -> None:
         date_key = ts[:10]
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cur = conn.cursor()
         cur.execute("""
             INSERT INTO events (ts, date_key, action, vehicle_type, plate_canonical, plate_display, fee, img_path, crop_path)
@@ -50,7 +70,7 @@ class ParkingDB:
 
     def latest_event_today(self, plate_canon: str) -> Optional[Dict[str, Any]]:
         today = date.today().strftime("%Y-%m-%d")
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         conn.row_factory = sqlite3.Row
         cur = conn.cursor()
         cur.execute("""
@@ -64,7 +84,7 @@ class ParkingDB:
         return dict(row) if row else None
 
     def latest_event(self, plate_canon: str) -> Optional[Dict[str, Any]]:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         conn.row_factory = sqlite3.Row
         cur = conn.cursor()
         cur.execute("""
@@ -79,7 +99,7 @@ class ParkingDB:
 
     def latest_in_today(self, plate_canon: str) -> Optional[Dict[str, Any]]:
         today = date.today().strftime("%Y-%m-%d")
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         conn.row_factory = sqlite3.Row
         cur = conn.cursor()
         cur.execute("""
@@ -93,7 +113,7 @@ class ParkingDB:
         return dict(row) if row else None
 
     def latest_in(self, plate_canon: str) -> Optional[Dict[str, Any]]:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         conn.row_factory = sqlite3.Row
         cur = conn.cursor()
         cur.execute("""
@@ -108,7 +128,7 @@ class ParkingDB:
 
     def today_summary(self) -> Tuple[int, Dict[str, int]]:
         today = date.today().strftime("%Y-%m-%d")
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cur = conn.cursor()
 
         cur.execute("""
@@ -130,7 +150,7 @@ class ParkingDB:
         return total_fee, counts
 
     def recent_events(self, limit: int = 20) -> List[Tuple]:
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cur = conn.cursor()
         cur.execute("""
             SELECT ts, action, vehicle_type, plate_display, plate_canonical, fee, img_path, crop_path
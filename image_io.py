@@ -1,6 +1,8 @@
+import os
+import tempfile
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, Tuple
+from typing import Dict, Optional, Tuple
 
 import cv2
 import numpy as np
@@ -13,7 +15,53 @@ def bgr_from_bytes(data: bytes) -> Optional[np.ndarray]:
 def bgr_to_rgb(img_bgr: np.ndarray) -> np.ndarray:
     return cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
 
-def save_pair(run_dir: str, full_bgr: np.ndarray, crop_bgr: Optional[np.ndarray]) -> Tuple[str, str]:
+def resize_max_side(img_bgr: np.ndarray, max_side: int) -> np.ndarray:
+    # Chỉ thu nhỏ, không phóng to (crop biển số thường đã nhỏ)
+    h, w = img_bgr.shape[:2]
+    if h == 0 or w == 0:
+        return img_bgr
+    scale = max_side / float(max(h, w))
+    if scale >= 1.0:
+        return img_bgr
+    size = (max(1, int(w * scale)), max(1, int(h * scale)))
+    return cv2.resize(img_bgr, size, interpolation=cv2.INTER_AREA)
+
+def encode_preview(img_bgr: np.ndarray, max_side: int, quality: int = 80) -> bytes:
+    """
+    Thu nhỏ + encode JPEG -> bytes (st.image nhận trực tiếp, payload gửi browser nhỏ).
+    """
+    if img_bgr.size == 0:
+        raise ValueError("Ảnh rỗng, không tạo được preview.")
+    small = resize_max_side(img_bgr, max_side)
+    ok, buf = cv2.imencode(".jpg", small, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    if not ok:
+        raise ValueError("Không encode được ảnh preview.")
+    return buf.tobytes()
+
+def thumb_path_for(thumb_dir: str, src_path: str) -> str:
+    return str(Path(thumb_dir) / f"{Path(src_path).stem}_thumb.jpg")
+
+def save_thumb(thumb_dir: str, src_path: str, img_bgr: np.ndarray, max_side: int) -> bytes:
+    data = encode_preview(img_bgr, max_side)
+    Path(thumb_dir).mkdir(parents=True, exist_ok=True)
+    # Ghi file tạm rồi os.replace: session khác không bao giờ đọc phải JPEG ghi dở
+    fd, tmp_path = tempfile.mkstemp(dir=thumb_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, thumb_path_for(thumb_dir, src_path))
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return data
+
+def save_pair(run_dir: str, full_bgr: np.ndarray, crop_bgr: Optional[np.ndarray],
+              thumb_dir: Optional[str] = None,
+              thumb_max_side: int = 320) -> Tuple[str, str, Dict[str, bytes]]:
+    """
+    Lưu ảnh full + crop. Nếu có thumb_dir: lưu thêm thumbnail và trả về
+    previews {path: jpeg bytes} để caller đưa thẳng vào ThumbCache / hiển thị.
+    """
     Path(run_dir).mkdir(parents=True, exist_ok=True)
     stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
     full_path = str(Path(run_dir) / f"{stamp}_full.jpg")
@@ -21,4 +69,11 @@ def save_pair(run_dir: str, full_bgr: np.ndarray, crop_bgr: Optional[np.ndarray]
     cv2.imwrite(full_path, full_bgr)
     if crop_bgr is not None:
         cv2.imwrite(crop_path, crop_bgr)
-    return full_path, crop_path
+
+    # Tạo sẵn thumbnail lúc lưu để so sánh IN/OUT + gallery không phải đọc ảnh gốc
+    previews: Dict[str, bytes] = {}
+    if thumb_dir:
+        previews[full_path] = save_thumb(thumb_dir, full_path, full_bgr, thumb_max_side)
+        if crop_bgr is not None:
+            previews[crop_path] = save_thumb(thumb_dir, crop_path, crop_bgr, thumb_max_side)
+    return full_path, crop_path, previews
@@ -0,0 +1,96 @@
+import sqlite3
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+st = pytest.importorskip("streamlit")
+from streamlit.testing.v1 import AppTest
+
+import engine
+
+APP = str(Path(__file__).resolve().parents[1] / "app.py")
+
+class _Tensor:
+    def __init__(self, values):
+        self.values = np.array(values, dtype=float)
+
+    def __getitem__(self, i):
+        return self
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.values
+
+class _Box:
+    conf = [0.9]
+    xyxy = [_Tensor([20, 20, 120, 60])]
+
+class _Result:
+    boxes = [_Box()]
+
+class FakeYolo:
+    def predict(self, **kwargs):
+        return [_Result()]
+
+class FakeOcr:
+    def predict(self, crop):
+        return [{"rec_texts": ["29A12345"]}]
+
+def jpeg_shot():
+    ok, buf = cv2.imencode(".jpg", np.full((240, 320, 3), 128, np.uint8))
+    return ("shot.jpg", buf.tobytes(), "image/jpeg")
+
+def event_count():
+    conn = sqlite3.connect("parking.db")
+    n = conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+    conn.close()
+    return n
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # app dùng đường dẫn tương đối (parking.db, runs/) -> chạy trong thư mục tạm
+    monkeypatch.chdir(tmp_path)
+    st.cache_resource.clear()
+    st.cache_data.clear()
+    at = AppTest.from_file(APP, default_timeout=60)
+    at.session_state["logged_in"] = True
+    at.session_state["username"] = "admin"
+    at.session_state["model_loaded"] = True
+    at.session_state["yolo"] = FakeYolo()
+    at.session_state["ocr"] = FakeOcr()
+    at.run()
+    return at
+
+def test_toggle_after_capture_does_not_insert_again(app):
+    app.camera_input[0].set_value(jpeg_shot())
+    app.run()
+    assert event_count() == 1
+    assert "IN" in app.success[0].value
+
+    app.toggle(key="full_res_compare").set_value(True)
+    app.run()
+    assert event_count() == 1
+    assert "IN" in app.success[0].value
+    assert not app.exception
+
+def test_pipeline_error_shows_message_and_rest_of_page(app, monkeypatch):
+    def boom(db, plate_canon):
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(engine, "decide_in_out", boom)
+    app.camera_input[0].set_value(jpeg_shot())
+    app.run()
+
+    assert [e.value for e in app.error] == ["Có lỗi khi chạy pipeline."]
+    assert "Nhật ký gần đây" in [s.value for s in app.subheader]
+    assert event_count() == 0
+
+    # rerun cùng ảnh: render lại kết quả lỗi đã lưu, không crash
+    app.toggle(key="full_res_compare").set_value(True)
+    app.run()
+    assert [e.value for e in app.error] == ["Có lỗi khi chạy pipeline."]
+    assert "Nhật ký gần đây" in [s.value for s in app.subheader]
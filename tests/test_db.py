@@ -0,0 +1,50 @@
+import threading
+
+import db as db_module
+from db import ParkingDB, query_count
+
+def test_count_query_skips_transaction_control():
+    q0 = query_count()
+    db_module._count_query("BEGIN ")
+    db_module._count_query("  commit")
+    db_module._count_query("ROLLBACK")
+    assert query_count() == q0
+    db_module._count_query("SELECT 1")
+    db_module._count_query("  insert into events values (1)")
+    assert query_count() == q0 + 2
+
+def test_counts_statements_only_when_enabled(tmp_path):
+    path = str(tmp_path / "parking.db")
+    ParkingDB(path).init()
+
+    q0 = query_count()
+    ParkingDB(path).today_summary()
+    assert query_count() == q0
+
+    counted = ParkingDB(path, count_queries=True)
+    q0 = query_count()
+    counted.today_summary()  # 2 câu SELECT trên 1 kết nối
+    assert query_count() == q0 + 2
+
+    q0 = query_count()
+    counted.insert_event("2026-01-16 03:59:09", "IN", "car", "29A12345", "29A 12345", 0, "", "")
+    assert query_count() == q0 + 1  # BEGIN/COMMIT ngầm không tính
+
+def test_counter_is_per_thread(tmp_path):
+    path = str(tmp_path / "parking.db")
+    ParkingDB(path).init()
+    counted = ParkingDB(path, count_queries=True)
+
+    q0 = query_count()
+    seen = {}
+
+    def worker():
+        t0 = query_count()
+        counted.recent_events()
+        seen["delta"] = query_count() - t0
+
+    t = threading.Thread(target=worker)
+    t.start()
+    t.join()
+    assert seen["delta"] == 1
+    assert query_count() == q0
@@ -0,0 +1,64 @@
+import os
+
+import numpy as np
+import pytest
+
+import image_io
+from image_io import encode_preview, resize_max_side, save_pair, save_thumb, thumb_path_for
+
+def frame(h, w):
+    return np.full((h, w, 3), 128, np.uint8)
+
+def test_resize_max_side_downscales_longest_side():
+    assert resize_max_side(frame(480, 640), 320).shape[:2] == (240, 320)
+
+def test_resize_max_side_never_upscales():
+    img = frame(40, 120)
+    assert resize_max_side(img, 320) is img
+
+def test_resize_max_side_empty_image():
+    img = frame(0, 0)
+    assert resize_max_side(img, 320) is img
+    with pytest.raises(ValueError):
+        encode_preview(img, 320)
+
+def test_save_thumb_writes_atomically(tmp_path):
+    thumb_dir = str(tmp_path / "thumbs")
+    data = save_thumb(thumb_dir, "runs/x_full.jpg", frame(480, 640), 320)
+    target = thumb_path_for(thumb_dir, "runs/x_full.jpg")
+    with open(target, "rb") as f:
+        assert f.read() == data
+    assert data[:2] == b"\xff\xd8"  # JPEG
+    assert os.listdir(thumb_dir) == [os.path.basename(target)]
+
+def test_save_thumb_cleans_temp_file_on_failure(tmp_path, monkeypatch):
+    thumb_dir = str(tmp_path / "thumbs")
+
+    def fail(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(image_io.os, "replace", fail)
+    with pytest.raises(OSError):
+        save_thumb(thumb_dir, "runs/x_full.jpg", frame(48, 64), 320)
+    assert os.listdir(thumb_dir) == []
+
+def test_save_pair_returns_previews(tmp_path):
+    run_dir = str(tmp_path / "runs")
+    thumb_dir = str(tmp_path / "thumbs")
+    full_path, crop_path, previews = save_pair(run_dir, frame(480, 640), frame(40, 120), thumb_dir=thumb_dir)
+    assert os.path.exists(full_path) and os.path.exists(crop_path)
+    assert set(previews) == {full_path, crop_path}
+    for path, data in previews.items():
+        with open(thumb_path_for(thumb_dir, path), "rb") as f:
+            assert f.read() == data
+
+def test_save_pair_without_crop(tmp_path):
+    full_path, crop_path, previews = save_pair(
+        str(tmp_path / "runs"), frame(48, 64), None, thumb_dir=str(tmp_path / "thumbs"),
+    )
+    assert crop_path == ""
+    assert list(previews) == [full_path]
+
+def test_save_pair_without_thumb_dir(tmp_path):
+    _, _, previews = save_pair(str(tmp_path / "runs"), frame(48, 64), frame(8, 16))
+    assert previews == {}
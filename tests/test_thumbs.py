@@ -0,0 +1,92 @@
+import os
+
+import numpy as np
+import pytest
+
+import thumbs
+from thumbs import ThumbCache
+
+@pytest.fixture
+def cache(tmp_path):
+    return ThumbCache(str(tmp_path / "thumbs"), max_side=32, max_bytes=10)
+
+@pytest.fixture
+def fake_thumbs(monkeypatch):
+    calls = []
+
+    def fake_save_thumb(thumb_dir, src_path, img_bgr, max_side):
+        calls.append(src_path)
+        return b"new-thumb"
+
+    monkeypatch.setattr(thumbs, "save_thumb", fake_save_thumb)
+    monkeypatch.setattr(thumbs.cv2, "imread", lambda path, flag: np.zeros((4, 4, 3), np.uint8))
+    return calls
+
+def write_src(tmp_path, name="a_full.jpg"):
+    src = tmp_path / name
+    src.write_bytes(b"jpeg")
+    return str(src)
+
+# Key giả không tồn tại trên đĩa: get() chỉ trả bytes nếu còn trong LRU
+def test_evicts_least_recently_used_over_byte_budget(cache, fake_thumbs):
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    cache.put("c", b"cccc")
+    assert cache.get("a") is None
+    assert cache.get("b") == b"bbbb"
+    assert cache.get("c") == b"cccc"
+    assert cache.size_bytes == 8
+
+def test_hit_moves_item_to_most_recent(cache, fake_thumbs):
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    assert cache.get("a") == b"aaaa"
+    cache.put("c", b"cccc")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"aaaa"
+
+def test_skips_item_larger_than_budget(cache, fake_thumbs):
+    cache.put("a", b"aaaa")
+    cache.put("big", b"x" * 11)
+    assert cache.get("big") is None
+    assert cache.get("a") == b"aaaa"
+    assert cache.size_bytes == 4
+
+def test_put_same_key_replaces_size(cache):
+    cache.put("a", b"aaaa")
+    cache.put("a", b"aa")
+    assert cache.size_bytes == 2
+    assert cache.get("a") == b"aa"
+
+def test_missing_source_returns_none(cache, fake_thumbs):
+    assert cache.get("/nonexistent/x_full.jpg") is None
+    assert cache.get("") is None
+    assert fake_thumbs == []
+
+def test_lazy_creates_thumb_for_old_image(cache, fake_thumbs, tmp_path):
+    src = write_src(tmp_path)
+    assert cache.get(src) == b"new-thumb"
+    assert fake_thumbs == [src]
+    # lần sau lấy từ RAM, không tạo lại
+    assert cache.get(src) == b"new-thumb"
+    assert fake_thumbs == [src]
+
+def test_reads_fresh_thumb_from_disk(cache, fake_thumbs, tmp_path):
+    src = write_src(tmp_path)
+    thumb = thumbs.thumb_path_for(cache.thumb_dir, src)
+    with open(thumb, "wb") as f:
+        f.write(b"disk")
+    os.utime(src, (1000, 1000))
+    os.utime(thumb, (2000, 2000))
+    assert cache.get(src) == b"disk"
+    assert fake_thumbs == []
+
+def test_regenerates_stale_thumb(cache, fake_thumbs, tmp_path):
+    src = write_src(tmp_path)
+    thumb = thumbs.thumb_path_for(cache.thumb_dir, src)
+    with open(thumb, "wb") as f:
+        f.write(b"old")
+    os.utime(thumb, (1000, 1000))
+    os.utime(src, (2000, 2000))
+    assert cache.get(src) == b"new-thumb"
+    assert fake_thumbs == [src]
@@ -0,0 +1,69 @@
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import cv2
+
+from image_io import save_thumb, thumb_path_for
+
+class ThumbCache:
+    """
+    Cache preview 2 tầng:
+    - RAM: LRU giới hạn theo tổng số bytes
+    - Đĩa: thumb_dir (tạo sẵn bởi save_pair, hoặc lazy lần đầu truy cập)
+    """
+
+    def __init__(self, thumb_dir: str, max_side: int = 320, max_bytes: int = 16 * 1024 * 1024):
+        self.thumb_dir = thumb_dir
+        self.max_side = max_side
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()  # dùng chung giữa các session (st.cache_resource)
+        Path(thumb_dir).mkdir(parents=True, exist_ok=True)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._size
+
+    def get(self, src_path: str) -> Optional[bytes]:
+        if not src_path:
+            return None
+        with self._lock:
+            data = self._items.get(src_path)
+            if data is not None:
+                self._items.move_to_end(src_path)
+                return data
+
+        data = self._load_or_create(src_path)
+        if data is not None:
+            self.put(src_path, data)
+        return data
+
+    def _load_or_create(self, src_path: str) -> Optional[bytes]:
+        if not os.path.exists(src_path):
+            return None
+        thumb_path = thumb_path_for(self.thumb_dir, src_path)
+        if os.path.exists(thumb_path) and os.path.getmtime(thumb_path) >= os.path.getmtime(src_path):
+            return Path(thumb_path).read_bytes()
+
+        # Lazy: ảnh cũ (trước khi có thumbnail) -> tạo 1 lần rồi lưu xuống đĩa
+        img = cv2.imread(src_path, cv2.IMREAD_COLOR)
+        if img is None:
+            return None
+        return save_thumb(self.thumb_dir, src_path, img, self.max_side)
+
+    def put(self, src_path: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(src_path, None)
+            if old is not None:
+                self._size -= len(old)
+            self._items[src_path] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted)